@@ -1,7 +1,9 @@
 import os
+from typing import Any, List, Literal, Optional
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from fastapi import FastAPI
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
 from agents.chatbot_agent import ChatBotAgent
 from agents.sql_generator_agent import SQLGeneratorAgent
 from agents.sql_validation_agent import SQLValidationAgent
@@ -11,6 +13,14 @@ from agents.data_analyzer import DataAnalyzer
 from clients.duckdb_client import DuckDBDataRetrievalClient
 from clients.postgres_client import PostgresClient
 from clients.llm_client import LLMClient
+from utils.responses import (
+    ARROW_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE,
+    ORJSONResponse,
+    arrow_response,
+    header_json,
+    rows_to_columns,
+)
 import logging
 
 # Load environment variables from .env
@@ -23,7 +33,16 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(debug=True)
+app = FastAPI(debug=True, default_response_class=ORJSONResponse)
+# Level 1 keeps compression cheap next to orjson; Arrow/Parquet bodies are
+# compressed by their own writers
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=1024,
+    compresslevel=1,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + (
+        ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE),
+)
 
 # Initialize Agents and Clients
 rag_manager = RAGManager()
@@ -57,6 +76,109 @@ class QueryRequest(BaseModel):
     query: str
 
 
+class RunSQLRequest(QueryRequest):
+    # "columns": one array per column, "rows": one array per row
+    orient: Literal["columns", "rows"] = "columns"
+    # "json" or a binary download ("arrow" IPC stream / "parquet" file)
+    format: Literal["json", "arrow", "parquet"] = "json"
+    compression: Optional[str] = None
+    # Keyset pagination: page size, the columns to page on (together they
+    # must be unique and non-NULL) and the `order_by` values of the last row
+    # of the previous page (the returned `next_cursor`)
+    limit: Optional[int] = Field(None, gt=0)
+    order_by: Optional[List[str]] = Field(None, min_length=1)
+    cursor: Optional[List[Any]] = None
+
+    @model_validator(mode="after")
+    def _check_pagination(self):
+        if (self.limit is None) != (self.order_by is None):
+            raise ValueError("'limit' and 'order_by' must be given together")
+        if self.cursor is not None:
+            if self.order_by is None:
+                raise ValueError("'cursor' requires 'limit' and 'order_by'")
+            if len(self.cursor) != len(self.order_by):
+                raise ValueError("'cursor' must have one value per 'order_by' column")
+        return self
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _base_query(request: RunSQLRequest) -> str:
+    # Newlines keep a trailing "--" comment from swallowing the wrapper
+    return "(\n" + request.query.strip().rstrip(";") + "\n) AS page"
+
+
+def _check_page_keys(request: RunSQLRequest):
+    """
+    Keyset paging only returns every row when the `order_by` columns are
+    unique and non-NULL across the whole result, so verify that up front.
+    """
+    keys = [_quote_identifier(name) for name in request.order_by]
+    is_null = " OR ".join(f"{key} IS NULL" for key in keys)
+    total, distinct, nulls = data_retrieval_client.db.execute(f"""
+        SELECT count(*), count(DISTINCT row({", ".join(keys)})),
+               count(*) FILTER (WHERE {is_null})
+        FROM {_base_query(request)}
+    """).fetchone()
+    if nulls:
+        raise ValueError(
+            f"'order_by' columns {request.order_by} contain NULL values")
+    if distinct != total:
+        raise ValueError(
+            f"'order_by' columns {request.order_by} are not unique; "
+            "add a unique tie-breaker column")
+
+
+def _check_page_boundary(request: RunSQLRequest, next_cursor: list):
+    """
+    Check only the last key of a cursor page (the first page checks the
+    whole result): rows sharing it with the next cursor would be skipped.
+    """
+    if any(value is None for value in next_cursor):
+        raise ValueError(
+            f"'order_by' columns {request.order_by} contain NULL values")
+    keys = [_quote_identifier(name) for name in request.order_by]
+    matches, = data_retrieval_client.db.execute(f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM {_base_query(request)}
+            WHERE {" AND ".join(f"{key} = ?" for key in keys)}
+            LIMIT 2
+        )
+    """, next_cursor).fetchone()
+    if matches > 1:
+        raise ValueError(
+            f"'order_by' columns {request.order_by} are not unique; "
+            "add a unique tie-breaker column")
+
+
+def _build_page_query(request: RunSQLRequest):
+    """
+    Wrap the user query so that only one page (plus one extra row, to tell
+    whether another page exists) is produced by the database.
+    Returns the SQL text and its bind parameters.
+    """
+    if request.limit is None:
+        return request.query, []
+
+    keys = [_quote_identifier(name) for name in request.order_by]
+    sql = f"SELECT * FROM {_base_query(request)}"
+    params = []
+    if request.cursor is not None:
+        # Lexicographic (k1, k2, ...) > (?, ?, ...), spelled out so each
+        # parameter is cast to its column's type
+        terms = []
+        for i, key in enumerate(keys):
+            conditions = [f"{prev} = ?" for prev in keys[:i]] + [f"{key} > ?"]
+            terms.append("(" + " AND ".join(conditions) + ")")
+            params.extend(request.cursor[:i + 1])
+        sql += " WHERE " + " OR ".join(terms)
+    sql += f" ORDER BY {', '.join(keys)} LIMIT ?"
+    params.append(request.limit + 1)
+    return sql, params
+
+
 @app.post("/query")
 def query_data(request: QueryRequest):
 
@@ -137,25 +259,61 @@ def get_table_key_value_pair(table_name: str, key: str):
 
 
 @app.post("/run-sql")
-def run_sql_query(request: QueryRequest):
+def run_sql_query(request: RunSQLRequest):
     """
     Endpoint to directly run a SQL query using the data_retrieval_client.
     """
     try:
+        if request.limit is not None and request.cursor is None:
+            _check_page_keys(request)
+        sql, params = _build_page_query(request)
+        cursor = data_retrieval_client.db.execute(sql, params)
+
+        if request.format != "json":
+            table = cursor.fetch_arrow_table()
+            headers = {}
+            if request.limit is not None:
+                has_more = table.num_rows > request.limit
+                next_cursor = None
+                if has_more:
+                    table = table.slice(0, request.limit)
+                    last_row = table.slice(request.limit - 1, 1)
+                    next_cursor = [last_row.column(name)[0].as_py()
+                                   for name in request.order_by]
+                    if request.cursor is not None:
+                        _check_page_boundary(request, next_cursor)
+                headers = {
+                    "X-Has-More": "true" if has_more else "false",
+                    "X-Next-Cursor": header_json(next_cursor),
+                }
+            return arrow_response(
+                table, request.format, request.compression, headers)
 
-        cursor = data_retrieval_client.db.execute(request.query)
         columns = [desc[0] for desc in cursor.description]
         rows = cursor.fetchall()
 
-        # Option A: Return columns + rows as arrays
-        return {
+        next_cursor = None
+        has_more = request.limit is not None and len(rows) > request.limit
+        if has_more:
+            rows = rows[:request.limit]
+            next_cursor = [rows[-1][columns.index(name)]
+                           for name in request.order_by]
+            if request.cursor is not None:
+                _check_page_boundary(request, next_cursor)
+
+        if request.orient == "columns":
+            data = rows_to_columns(columns, rows)
+        else:
+            data = rows
+
+        # Return the response directly to skip FastAPI's jsonable_encoder
+        return ORJSONResponse({
             "columns": columns,
-            "data": rows
-        }
-
-        # Option B: Return a list of dicts
-        # data_as_dicts = [dict(zip(columns, row)) for row in rows]
-        # return {"data": data_as_dicts}
+            "orient": request.orient,
+            "data": data,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
 
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,115 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for binary downloads
+    pa = None
+    pq = None
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+def _orjson_default(obj: Any):
+    """
+    Fallback for types orjson does not serialize natively.
+    Decimals are sent as strings so no precision is lost. Dates and UUIDs
+    are only seen here on the stdlib `json` fallback path.
+    """
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).hex()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    try:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    except orjson.JSONEncodeError:
+        # orjson rejects integers outside the 64-bit range (e.g. DuckDB
+        # HUGEINT) without calling `default`; the stdlib encoder has no limit
+        return json.dumps(
+            content, default=_orjson_default, separators=(",", ":")
+        ).encode()
+
+
+def header_json(content: Any) -> str:
+    """
+    Encode `content` as ASCII-only JSON, suitable for an HTTP header value.
+    """
+    return json.dumps(content, default=_orjson_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Handles dates, datetimes, UUIDs and
+    numpy values natively and Decimals through `_orjson_default`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_columns(columns: Sequence[str], rows: List[tuple]) -> List[tuple]:
+    """
+    Transpose row tuples into one sequence per column.
+    """
+    if not rows:
+        return [() for _ in columns]
+    return list(zip(*rows))
+
+
+def arrow_response(table, fmt: str, compression: Optional[str] = None,
+                   headers: Optional[dict] = None) -> Response:
+    """
+    Serialize a pyarrow Table as an Arrow IPC stream or a Parquet file.
+    `compression` is passed through to the writer (e.g. "zstd", "lz4" for
+    Arrow; "zstd", "gzip", "snappy" for Parquet). Extra `headers` are added
+    to the response.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for binary result formats")
+
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        media_type, extension = ARROW_MEDIA_TYPE, "arrow"
+    elif fmt == "parquet":
+        pq.write_table(table, sink, compression=compression or "zstd")
+        media_type, extension = PARQUET_MEDIA_TYPE, "parquet"
+    else:
+        raise ValueError(f"Unsupported binary format '{fmt}'")
+
+    return Response(
+        content=sink.getvalue(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="result.{extension}"',
+            **(headers or {}),
+        },
+    )